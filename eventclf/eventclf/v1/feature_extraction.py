@@ -6,7 +6,80 @@ from sklearn.impute import SimpleImputer
 from eventclf.v1.preprocessing import rich_analyzer_w2v
 
 emotre = re.compile(
-    r'(:\w+\:|\<[\/\\]?3|[\(\)\\\D|\*\$][\-\^]?[\:\;\=]|[\:\;\=B8][\-\^]?[3DOPp\@\$\*\\\)\(\/\|])(?=\s|[\!\.\?]|$)')
+    r'(:\w+\:|\<[\/\\]?3|[\(\)\\\D|\*\$][\-\^]?[\:\;\=]|[\:\;\=B8][\-\^]?[3DOPp\@\$\*\\\)\(\/\|])(?=\s|[\!\.\?]|$)',
+    re.ASCII)
+
+# every alternation branch of emotre needs at least one of these characters,
+# so a tweet without any of them can skip the scan entirely
+_emoticon_triggers = frozenset(':;=B8<')
+
+_word_chars = frozenset(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+_digits = frozenset('0123456789')
+_boundary_chars = frozenset(' \t\n\r\x0b\x0c!.?')
+_emoticon_mouths = frozenset('3DOPp@$*\\)(/|')
+
+
+def _boundary_ok(text, pos):
+    return pos >= len(text) or text[pos] in _boundary_chars
+
+
+def _match_emoticon(text, i):
+    """Tries the emotre branches at position i; returns the end of the first
+    branch that matches (including the boundary check), or -1.
+
+    Branches and their order mirror the emotre alternation exactly:
+    :word:, <3 hearts, reversed faces ending in eyes, and faces starting with
+    eyes. The boundary check replicates the trailing lookahead.
+    """
+    n = len(text)
+    char = text[i]
+    # :\w+:
+    if char == ':':
+        j = i + 1
+        while j < n and text[j] in _word_chars:
+            j += 1
+        if j > i + 1 and j < n and text[j] == ':' and _boundary_ok(text, j + 1):
+            return j + 1
+    # <3 </3 <\3
+    if char == '<':
+        if i + 2 < n and text[i + 1] in '/\\' and text[i + 2] == '3' \
+                and _boundary_ok(text, i + 3):
+            return i + 3
+        if i + 1 < n and text[i + 1] == '3' and _boundary_ok(text, i + 2):
+            return i + 2
+    # [\(\)\\\D|\*\$][\-\^]?[\:\;\=] -- the \D makes the class any non-digit
+    if char not in _digits:
+        if i + 2 < n and text[i + 1] in '-^' and text[i + 2] in ':;=' \
+                and _boundary_ok(text, i + 3):
+            return i + 3
+        if i + 1 < n and text[i + 1] in ':;=' and _boundary_ok(text, i + 2):
+            return i + 2
+    # [\:\;\=B8][\-\^]?[3DOPp\@\$\*\\\)\(\/\|]
+    if char in ':;=B8':
+        if i + 2 < n and text[i + 1] in '-^' and text[i + 2] in _emoticon_mouths \
+                and _boundary_ok(text, i + 3):
+            return i + 3
+        if i + 1 < n and text[i + 1] in _emoticon_mouths \
+                and _boundary_ok(text, i + 2):
+            return i + 2
+    return -1
+
+
+def count_emoticons(text):
+    if not _emoticon_triggers.intersection(text):
+        return 0
+    count = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        end = _match_emoticon(text, i)
+        if end == -1:
+            i += 1
+        else:
+            count += 1
+            i = end
+    return count
 
 # types of features
 textual_feats = ['tweet.text']
@@ -177,7 +250,7 @@ def adapt_features(df, dates):
     df['num.hashtags'] = df['entities.hashtags'].apply(
         lambda x: len(literal_eval(x)))
     df['ratio_ff'] = (df[u'au.followers_count'] + df[u'au.friends_count']) * 0.5
-    df['num.emoticons'] = df['text'].apply(lambda x: len(emotre.findall(x)))
+    df['num.emoticons'] = df['text'].apply(count_emoticons)
     df = df.rename(columns={'text': 'tweet.text'})
 
     # convert days to number
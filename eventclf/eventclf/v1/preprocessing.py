@@ -1,4 +1,5 @@
 # import cleaning_process
+import functools
 from html.parser import HTMLParser
 from nltk.stem.wordnet import WordNetLemmatizer
 import re
@@ -7,6 +8,7 @@ import calendar
 from nltk.corpus import stopwords
 stop_words = stopwords.words("english")
 # stop_words = []
+_stop_words_set = frozenset(stop_words)
 
 hash_tags = ['creamfields2016', 'creamfields', 'creamfield'] + ['vfestival', 'V21st', 'vfest2016', 'vfest', 'v festival', 'v fest']
 
@@ -60,9 +62,35 @@ def ngrams(items, n, prefix):
             range(0, len(items) - n + 1)]
 
 
-def rich_analyzer_textual(doc):
+@functools.lru_cache(maxsize=2 ** 16)
+def _normalise_token_textual(token):
+    # tokens repeat massively across a corpus, so the lemmatizer and the
+    # normalisation checks run once per distinct token instead of per
+    # occurrence
+    token = lemmatizer.lemmatize(token, 'v')
+    token = lemmatizer.lemmatize(token, 'a')
+    if represents_int(token):
+        return 'numberint'
+    if represents_float(token):
+        return 'numberfloat'
+    if is_time_format(token.replace('pm', '').replace('am', '')):
+        return 'hourdate'
+    if token in months:
+        return 'monthdate'
+    if token == 'u':
+        return 'you'
+    if token == 'jel':
+        return 'jealous'
+    if token in ('not', "n't", 'no'):
+        return 'not'
+    if soore.findall(token):
+        return 'so'
+    return token
+
+
+@functools.lru_cache(maxsize=100_000)
+def _rich_analyzer_textual_cached(doc):
     word_ngrams = [2, 3]
-    stopwords = set(stop_words)
     doc = clean_html(doc)
 
     doc = doc.encode('utf-8')
@@ -74,39 +102,25 @@ def rich_analyzer_textual(doc):
         doc = str(doc).replace(tag, 'festivalname')
         doc = str(doc).replace('£', ' pounds ')
 
-    output = list()
     questions = ['?(question_mark)' for x in questionre.findall(doc)]
-    output.extend(featre.findall(doc))
-
-    output = map(lambda x: lemmatizer.lemmatize(x, 'v'), output)
-    output = map(lambda x: lemmatizer.lemmatize(x, 'a'), output)
+    output = [_normalise_token_textual(x) for x in featre.findall(doc)]
 
-    output = map(lambda x: x if not represents_int(x) else 'numberint', output)
-    output = map(lambda x: x if not represents_float(x) else 'numberfloat',
-                 output)
-    output = map(lambda x: x if not is_time_format(
-        str(x).replace('pm', '').replace('am', '')) else 'hourdate', output)
-    output = map(lambda x: x if not x in months else 'monthdate', output)
-    output = map(lambda x: 'you' if str(x) in ['u'] else x, output)
-    output = map(lambda x: 'jealous' if str(x) in ['jel'] else x, output)
-    output = map(lambda x: 'not' if str(x) in ['not', "n't", 'no'] else x,
-                 output)
-    output = [x if len(soore.findall(x)) == 0 else 'so' for x in output]
-
-    if word_ngrams is None:
-        word_ngrams = list()
     ngm = list()
     for n in word_ngrams:
         ngm.extend(ngrams(output, n, '_W%iG_' % n))
     output.extend(ngm)
 
-    output = [x for x in output if len(x) > 1 and not x in stopwords]
+    output = [x for x in output if len(x) > 1 and not x in _stop_words_set]
     output = [x for x in output if
               len(x) > 1 and not x in ['#festivalname', '@festivalname',
                                        'festivalname']]
     output.extend(questions)
 
-    return output
+    return tuple(output)
+
+
+def rich_analyzer_textual(doc):
+    return list(_rich_analyzer_textual_cached(doc))
 
 
 def rich_analyzer_w2v(doc):
@@ -1,16 +1,13 @@
 import re
-from ast import literal_eval
 from datetime import datetime
 from typing import List, Optional
 
 import numpy as np
 import pandas as pd
-from dateutil import parser
-from sklearn.impute import SimpleImputer
+import pyarrow as pa
+import pyarrow.compute as pc
 
-emotre = re.compile(
-    r"(:\w+\:|\<[\/\\]?3|[\(\)\\\D|\*\$][\-\^]?[\:\;\=]|[\:\;\=B8][\-\^]?[3DOPp\@\$\*\\\)\(\/\|])(?=\s|[\!\.\?]|$)"
-)
+from eventclf.v1.feature_extraction import count_emoticons
 
 all_feats = [
     "tweet.text",
@@ -28,7 +25,52 @@ all_feats = [
     "days_dif",
 ]
 
-imp = SimpleImputer(missing_values=np.nan, strategy="mean")
+
+def _contains_flag(column: pd.Series, needle: str) -> np.ndarray:
+    """Flags rows whose string contains a literal needle
+
+    Runs Arrow's match_substring kernel over the whole column; the kernel
+    releases the GIL and parallelises across chunks, unlike the per-column
+    Python dispatch of pandas str.contains.
+
+    Parameters
+    ----------
+    column : pd.Series
+        column of strings to scan
+    needle : str
+        literal substring to look for
+
+    Returns
+    -------
+    np.ndarray
+        uint8 array of 0/1 flags, nulls counted as 0
+    """
+    arr = pa.array(column, type=pa.string(), from_pandas=True)
+    flags = pc.fill_null(pc.match_substring(arr, needle), False)
+    return flags.cast(pa.uint8()).to_numpy(zero_copy_only=False)
+
+
+def _count_list_items(column: pd.Series) -> pd.Series:
+    """Counts the elements of a list-repr string column without parsing it
+
+    A non-empty list repr such as "['a', 'b']" contains one comma fewer than
+    it has elements, and an empty list repr is just "[]". Counting separators
+    avoids building an AST and a throwaway list per row with literal_eval.
+
+    Parameters
+    ----------
+    column : pd.Series
+        column of list-repr strings
+
+    Returns
+    -------
+    pd.Series
+        number of elements per row
+    """
+    return pd.Series(
+        np.where(column.str.len() > 2, column.str.count(",") + 1, 0),
+        index=column.index,
+    ).astype("uint16")
 
 
 def clean_text(text: str, remove_words: Optional[List[str]] = None) -> str:
@@ -46,7 +88,7 @@ def clean_text(text: str, remove_words: Optional[List[str]] = None) -> str:
     str
         cleaned string
     """
-    cleaned_text = re.sub("\@\S{40}", "@UserHandle ", text)  # noqa W605
+    cleaned_text = re.sub(r"@\S{40}", "@UserHandle ", text)
     if remove_words:
         for word in remove_words:
             cleaned_text = cleaned_text.replace(word, "event")
@@ -79,42 +121,44 @@ def clean_data(
     """
     # filtering spam
 
-    df["tweet.videos"] = df["entities.media"].apply(
-        lambda x: 1 if "video" in str(x) else 0
-    )
-    df["tweet.photos"] = df["entities.media"].apply(
-        lambda x: 1 if "photo" in str(x) else 0
-    )
-    df["tweet.instagram"] = df["entities.urls"].apply(
-        lambda x: 1 if "instagram" in str(x.encode("utf-8")) else 0
-    )
+    df["tweet.videos"] = _contains_flag(df["entities.media"], "video")
+    df["tweet.photos"] = _contains_flag(df["entities.media"], "photo")
+    df["tweet.instagram"] = _contains_flag(df["entities.urls"], "instagram")
 
-    df["tweet.youtube"] = df["entities.urls"].apply(
-        lambda x: 1 if "youtube" in str(x.encode("utf-8")) else 0
-    )
-    df["tweet.foursquare"] = df["text"].apply(lambda x: 1 if "checked" in x else 0)
-    df["tweet.facebook"] = df["entities.urls"].apply(
-        lambda x: 1 if "facebook.com" in str(x.encode("utf-8")) else 0
-    )
-    df["tweet.snapchat"] = df["text"].apply(lambda x: 1 if "snap" in x else 0)
+    df["tweet.youtube"] = _contains_flag(df["entities.urls"], "youtube")
+    df["tweet.foursquare"] = _contains_flag(df["text"], "checked")
+    df["tweet.facebook"] = _contains_flag(df["entities.urls"], "facebook.com")
+    df["tweet.snapchat"] = _contains_flag(df["text"], "snap")
 
-    df["num.urls"] = df["entities.urls"].apply(lambda x: len(literal_eval(x)))
-    df["num.hashtags"] = df["entities.hashtags"].apply(lambda x: len(literal_eval(x)))
+    df["num.urls"] = _count_list_items(df["entities.urls"])
+    df["num.hashtags"] = _count_list_items(df["entities.hashtags"])
     df["ratio_ff"] = (df["au.followers_count"] + df["au.friends_count"]) * 0.5
-    df["num.emoticons"] = df["text"].apply(lambda x: len(emotre.findall(x)))
+    # the v1 scanner counts exactly what the original backtracking regex
+    # matched; Arrow's RE2 port consumed the boundary character and drifted
+    # on adjacent emoticons
+    df["num.emoticons"] = df["text"].apply(count_emoticons)
     df = df.rename(columns={"text": "tweet.text"})
 
     # convert days to number
 
-    df["days_dif"] = df["created_at_tr"].apply(
-        lambda x: min(
-            abs((parser.parse(x) - min(dates)).days),
-            abs((parser.parse(x) - max(dates)).days),
-        )
+    dmin, dmax = min(dates), max(dates)
+    created_at = pd.to_datetime(df["created_at_tr"], utc=True, cache=True).dt.tz_localize(
+        None
+    )
+    df["days_dif"] = np.minimum(
+        (created_at - dmin).dt.days.abs(), (created_at - dmax).dt.days.abs()
     )
     df = df[features]
-    df["tweet.text"] = df["tweet.text"].apply(lambda x: clean_text(x, remove_words))
-    imp_trained = imp.fit(df.drop(columns="tweet.text"))
-    imp_out = imp_trained.transform(df.drop(columns="tweet.text"))
-    imp_out = pd.DataFrame(imp_out, columns=features[1:])
-    return pd.concat([df["tweet.text"], imp_out], axis=1)
+    df["tweet.text"] = df["tweet.text"].str.replace(
+        r"@\S{40}", "@UserHandle ", regex=True
+    )
+    if remove_words:
+        remove_pattern = "|".join(re.escape(word) for word in remove_words)
+        df["tweet.text"] = df["tweet.text"].str.replace(
+            remove_pattern, "event", regex=True
+        )
+    df["tweet.text"] = df["tweet.text"].str.encode("ascii", "ignore").str.decode("ascii")
+    numeric_cols = [col for col in features if col != "tweet.text"]
+    numeric = df[numeric_cols]
+    df[numeric_cols] = numeric.fillna(numeric.mean())
+    return df
@@ -1,24 +1,58 @@
+import functools
+from typing import Optional
+
 import gensim.downloader
 import numpy as np
 import pandas as pd
+from gensim.models import KeyedVectors
+from scipy import sparse
 from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer
 
 from eventclf.v1.preprocessing import rich_analyzer_textual
 from eventclf.v1.w2v_model import MaxEmbeddingVectorizer
 
 
+@functools.lru_cache(maxsize=1)
+def _load_w2v() -> KeyedVectors:
+    """Loads the pretrained word2vec vectors once per process
+
+    The google-news vectors are ~1.6GB on disk, so every classifier instance
+    reloading them costs tens of seconds and multiple GB of memory. Caching at
+    module level lets all instances share one copy.
+
+    Returns
+    -------
+    KeyedVectors
+        pretrained word2vec-google-news-300 vectors
+    """
+    return gensim.downloader.load("word2vec-google-news-300")
+
+
 class EventGradientBoostingClassifier:
-    def __init__(self):
-        """Initialises Gradient Boosting Classifier"""
-        self._vect_bow = CountVectorizer(tokenizer=rich_analyzer_textual)
-        w2v_vectors = gensim.downloader.load("word2vec-google-news-300")
+    def __init__(self, w2v_vectors: Optional[KeyedVectors] = None):
+        """Initialises Gradient Boosting Classifier
+
+        Parameters
+        ----------
+        w2v_vectors : Optional[KeyedVectors], optional
+            preloaded word2vec vectors; when None the cached
+            word2vec-google-news-300 vectors are used, by default None
+        """
+        self._vect_bow = HashingVectorizer(
+            tokenizer=rich_analyzer_textual,
+            n_features=2**20,
+            alternate_sign=False,
+            norm=None,
+        )
+        if w2v_vectors is None:
+            w2v_vectors = _load_w2v()
         self._vect_w2v = MaxEmbeddingVectorizer(w2v_vectors)
         self._model = GradientBoostingClassifier(
             random_state=4, n_estimators=100, max_depth=3
         )
 
-    def _vectorise(self, text: pd.Series) -> np.array:
+    def _vectorise(self, text: pd.Series) -> sparse.csr_matrix:
         """vectorises text content using bag of words and word_2_vec
 
         Parameters
@@ -28,14 +62,15 @@ class EventGradientBoostingClassifier:
 
         Returns
         -------
-        np.array
-            concatonated vectors of text input
+        sparse.csr_matrix
+            concatonated vectors of text input, kept sparse since the bag of
+            words block is almost entirely zeros
         """
         bow = self._vect_bow.transform(text)
         w2v = self._vect_w2v.transform(text)
-        return np.concatenate((bow.todense(), w2v), axis=1)
+        return sparse.hstack([bow, sparse.csr_matrix(w2v)], format="csr")
 
-    def _tranform_input(self, df: pd.DataFrame) -> np.array:
+    def _tranform_input(self, df: pd.DataFrame) -> sparse.csr_matrix:
         """Processes text input for dataframe
 
         Parameters
@@ -45,12 +80,13 @@ class EventGradientBoostingClassifier:
 
         Returns
         -------
-        np.array
-            np array of numerical input for model
+        sparse.csr_matrix
+            sparse matrix of numerical input for model
         """
         word_vectors = self._vectorise(df[self._text_column])
-        input = np.concatenate(
-            (word_vectors, df.drop(columns=self._text_column).to_numpy()), axis=1
+        numeric = df[self._numeric_cols].to_numpy(dtype=np.float32)
+        input = sparse.hstack(
+            [word_vectors, sparse.csr_matrix(numeric)], format="csr"
         )
         return input
 
@@ -67,7 +103,7 @@ class EventGradientBoostingClassifier:
             name of text column, by default "tweet.text"
         """
         self._text_column = text_column
-        self._vect_bow.fit(x[self._text_column])
+        self._numeric_cols = [col for col in x.columns if col != text_column]
         x_transformed = self._tranform_input(x)
         self._model.fit(x_transformed, y)
 
@@ -27,6 +27,9 @@ class EventSetfit:
         if load_model:
             self._model = SetFitModel.from_pretrained(model)
             self._model.to(device)
+            if torch.device(device).type == "cuda":
+                # halve the encoder weights for ~2x inference throughput
+                self._model.model_body.half()
 
     def fit(
         self,
@@ -91,20 +94,26 @@ class EventSetfit:
         trainer.train()
         self._model = trainer.model
 
-    def predict(self, text: List[str]) -> np.array:
+    def predict(self, text: List[str], batch_size: int = 32) -> np.array:
         """Uses trained model to predict label of outut
 
         Parameters
         ----------
         text : List[str]
             list of inputs to classify
+        batch_size : int, optional
+            number of inputs encoded per batch, by default 32
 
         Returns
         -------
         np.array
             binary array of classification
         """
-        return np.array(self._model.predict(text))
+        with torch.inference_mode():
+            predictions = self._model.predict(
+                text, batch_size=batch_size, show_progress_bar=False
+            )
+        return np.array(predictions)
 
     def save(self, outpath: str):
         """Saves local model
@@ -28,6 +28,7 @@ setuptools.setup(
     install_requires=[
         "numpy==1.26",
         "pandas",
+        "pyarrow",
         "nltk",
         "datasets",
         "setfit",
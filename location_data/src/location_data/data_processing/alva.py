@@ -1,7 +1,9 @@
 from pathlib import PosixPath
 from typing import Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
+from numba import njit
 
 RENAME_SITES = {
     "Nymans": "Nymans Gardens",
@@ -93,6 +95,19 @@ DEFAULT_ENTRY_REPL_DICT = {
 }
 
 
+@njit(cache=True)
+def _grouped_pct_change(codes, values, out):
+    """Writes the within-group percentage change into out
+
+    Expects codes and values sorted so rows of a group are adjacent and in
+    year order; the first row of each group keeps the NaN that out is
+    initialised with.
+    """
+    for i in range(1, codes.shape[0]):
+        if codes[i] == codes[i - 1]:
+            out[i] = (values[i] / values[i - 1] - 1.0) * 100.0
+
+
 def clean_alva_data(
     alva_data_path: Union[str, PosixPath],
     rename_sites: Optional[Dict[str, str]] = RENAME_SITES,
@@ -117,7 +132,7 @@ def clean_alva_data(
     pd.DataFrame
         Dataframe of processed alva data
     """
-    gt_df = pd.read_csv(alva_data_path)
+    gt_df = pd.read_csv(alva_data_path, engine="pyarrow")
     gt_df = gt_df.rename(
         columns={
             "Site": "site_name",
@@ -135,26 +150,27 @@ def clean_alva_data(
     if rename_sites:
         gt_df["site_name"] = gt_df["site_name"].replace(rename_sites)
     gt_df["gt_total_visits"] = (
-        gt_df["gt_total_visits"].str.replace(",", "").astype(int)
+        gt_df["gt_total_visits"].str.replace(",", "", regex=False).astype("int64")
     )  # Visitation numbers in ALVA data are available in thousand seperator format, which makes it an object (string) type column. Reformatting it into Int type
-    gt_df["pct_changed"] = gt_df["pct_changed"].str.replace(
-        "%", ""
-    )  # Percentage change is an object type colum with values like (10.2%). Removing the % sign to convert it into float format
-    gt_df["pct_changed"] = gt_df["pct_changed"].str.replace(
-        "", "0"
-    )  # Percentage change value is not available for some of the years for some sites. Some records have empty string instead of NA. Replacing empty string with '0'
     gt_df["pct_changed"] = pd.to_numeric(
-        gt_df["pct_changed"], errors="coerce"
-    )  # Converting the object type to float type
-    gt_df["pct_changed"] = gt_df["pct_changed"].fillna(
-        "0"
-    )  # Filling NA values with '0'
-    gt_df["pct_changed_calculated"] = (
-        gt_df.sort_values(by=["site_name", "year"])
-        .groupby(["site_name"])["gt_total_visits"]
-        .pct_change()
-        * 100
+        gt_df["pct_changed"].str.rstrip("%"), errors="coerce"
+    ).fillna(
+        0.0
+    )  # Percentage change is an object type column with values like (10.2%). Stripping the % sign and coercing to float; empty strings and NA both become 0
+    # sort by (site, year), run the jitted kernel over the flat arrays and
+    # scatter the result back through the inverse permutation; this skips
+    # the sorted-frame copy and per-group pct_change dispatch
+    codes, _ = pd.factorize(gt_df["site_name"])
+    order = np.lexsort((gt_df["year"].to_numpy(), codes))
+    pct_changed = np.full(len(gt_df), np.nan)
+    _grouped_pct_change(
+        codes[order],
+        gt_df["gt_total_visits"].to_numpy(dtype=np.float64)[order],
+        pct_changed,
     )
+    unsorted = np.empty_like(pct_changed)
+    unsorted[order] = pct_changed
+    gt_df["pct_changed_calculated"] = unsorted
 
     # replace_dict_2019 = {"F": 1, "C": 2, "F/C": 3}
     # replace_dict_2020 = {"F": 1, "C": 2, "F/C": 3}
@@ -191,10 +207,17 @@ def clean_alva_data(
     #     gt_df["year"] == 2023, "entry"
     # ].replace(replace_dict_2023)
 
-    for year, replace_dict in entry_replace_dict.items():
-        gt_df.loc[gt_df["year"] == year, "entry"] = gt_df.loc[
-            gt_df["year"] == year, "entry"
-        ].replace(replace_dict)
+    # flattening the per-year dicts onto (year, entry) keys replaces one
+    # masked replace pass per year with a single map over the frame
+    entry_map = {
+        (year, key): value
+        for year, replace_dict in entry_replace_dict.items()
+        for key, value in replace_dict.items()
+    }
+    entry_keys = pd.Series(
+        list(zip(gt_df["year"], gt_df["entry"])), index=gt_df.index
+    )
+    gt_df["entry"] = entry_keys.map(entry_map).fillna(gt_df["entry"])
 
     # gt_df = gt_df.drop(columns=["group", "note"])
     columns_to_drop = ["group", "note"]  # Dropping these columns if they exist
@@ -204,11 +227,8 @@ def clean_alva_data(
     mode_location_type = gt_df.groupby("site_name")["location_type"].agg(
         lambda x: x.mode().iloc[0] if not x.mode().empty else None
     )
-    gt_df["location_type"] = gt_df.apply(
-        lambda row: mode_location_type[row["site_name"]]
-        if pd.isna(row["location_type"])
-        else row["location_type"],
-        axis=1,
+    gt_df["location_type"] = gt_df["location_type"].fillna(
+        gt_df["site_name"].map(mode_location_type)
     )
     gt_df["location_type"] = gt_df["location_type"].replace({"Mix": "M"})
     if excluded_sites:
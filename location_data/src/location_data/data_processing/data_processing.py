@@ -1,8 +1,9 @@
+import itertools
 from typing import Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer
 
 MANUAL_SITE_MATCH = {
     "University of Oxford Botanic Garden": "Oxford Botanical Gardens and Arboretum",
@@ -28,50 +29,37 @@ ATTRIBUTES = [
 ]
 
 
-def checkMultipleMatches(row: pd.Series) -> bool:
-    """
-    Description:
-        This function checks if any site in a shape file has multiple matches in ALVA sites.
-        Name of some sites in ALVA data changed in different years. This function captures
-        that multiple matches
+# Sites can be labeled as potential matches purely on common words such as
+# Castle, House, Museum etc., so these are ignored when checking for
+# multiple matches
+_COMMON_SITE_WORDS = frozenset(
+    ["Castle", "House", "Museum", "Garden", "Park", "Estate", "Hall", "Abbey"]
+)
 
-    Parameters:
-        row (pd.Series): Function takes pandas' series (row) of the data.
 
-    Retruns:
-        Returns 'True' or 'False' depending upon the availability of multiple matches for a site
+def _has_multiple_matches(best_match: str, other_matches: List[str]) -> bool:
+    """Checks whether a site has potential matches beyond its best match
 
-    """
+    Name of some sites in ALVA data changed in different years, so a site in
+    a shape file can legitimately match more than one ALVA site. A site is
+    flagged when any non-common word of its best match also appears in one of
+    the other candidate matches.
+
+    Parameters
+    ----------
+    best_match : str
+        name of the best matched site
+    other_matches : List[str]
+        the remaining candidate matches, best match excluded
 
-    all_matches = row[
-        "all_matched"
-    ]  # Fetching all the sites that were labeled as potential matches sorted with respect to match score.
-    all_matches.pop(
-        0
-    )  # Removing the first match as it's the best match. And we want to see if there's any other potential match other than the best match.
-    best_match_words = row["best_match"].split(
-        " "
-    )  # Tokenizing the best matched site name
-    found = False
-    for (
-        word
-    ) in best_match_words:  # Iterating through each word in best matched site name
-        if word not in [
-            "Castle",
-            "House",
-            "Museum",
-            "Garden",
-            "Park",
-            "Estate",
-            "Hall",
-            "Abbey",
-        ]:  # Sites could be labeled as potential match based on some common words such as Castle, House, Museum etc. Checking if the matched word is not common word and it's present in the name of one or more sites in the all matched sites, it returns 'True'
-            for site in all_matches:
-                if word in site:
-                    found = True
-                    return found
-
-    return found
+    Returns
+    -------
+    bool
+        True when another candidate shares a distinctive word with the best
+        match
+    """
+    words = [word for word in best_match.split(" ") if word not in _COMMON_SITE_WORDS]
+    return any(word in site for site in other_matches for word in words)
 
 
 def get_matched_sites(
@@ -96,22 +84,36 @@ def get_matched_sites(
     pd.DataFrame
         dataframe of site names of huq data in one column and the best matching name in the ground truth data
     """
-    all_sites = list(gt_sites) + list(target_sites)
-    vectorizer = TfidfVectorizer().fit(all_sites)
-    tfidf_matrix = vectorizer.transform(all_sites)
-    tfidf_gt_sites = tfidf_matrix[: len(gt_sites)]
-    tfidf_target_sites = tfidf_matrix[len(gt_sites) :]
+    n_gt = len(gt_sites)
+    # hashing needs no vocabulary pass, and character n-grams are more
+    # forgiving of the small spelling differences between site names than
+    # whole-word tokens
+    vectorizer = HashingVectorizer(
+        analyzer="char_wb",
+        ngram_range=(3, 5),
+        n_features=2**18,
+        norm="l2",
+        alternate_sign=False,
+    )
+    site_matrix = vectorizer.transform(itertools.chain(gt_sites, target_sites))
+    gt_vectors = site_matrix[:n_gt]
+    target_vectors = site_matrix[n_gt:]
+    # rows are l2 normalised, so the dot product is already the cosine
+    # similarity; one sparse matmul replaces a cosine_similarity call per site
+    sims = (target_vectors @ gt_vectors.T).toarray()
+    k = min(10, len(gt_sites))
+    top_indices = np.argpartition(sims, -k, axis=1)[:, -k:]
+    top_scores = np.take_along_axis(sims, top_indices, axis=1)
+    order = np.argsort(top_scores, axis=1)[:, ::-1]
+    top_indices = np.take_along_axis(top_indices, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
     matching_sites = []
-    for i, site in enumerate(target_sites):
-        cosine_similarities = cosine_similarity(
-            tfidf_target_sites[i], tfidf_gt_sites
-        ).flatten()
-        top_5_indices = cosine_similarities.argsort()[-10:][::-1]
-        matched_sites = [gt_sites[idx] for idx in top_5_indices]
-        scores = [cosine_similarities[idx] for idx in top_5_indices]
-        best_match = matched_sites[0]
-        best_score = scores[0]
-        matching_sites.append([site, best_match, best_score, matched_sites, scores])
+    for site, index_row, score_row in zip(target_sites, top_indices, top_scores):
+        matched_sites = [gt_sites[idx] for idx in index_row]
+        scores = list(score_row)
+        matching_sites.append(
+            [site, matched_sites[0], scores[0], matched_sites, scores]
+        )
     match_df = pd.DataFrame(
         matching_sites,
         columns=[
@@ -122,7 +124,10 @@ def get_matched_sites(
             "matching_score",
         ],
     )
-    match_df["multiple_matches"] = match_df.apply(checkMultipleMatches, axis=1)
+    match_df["multiple_matches"] = [
+        _has_multiple_matches(best_match, matches[1:])
+        for best_match, matches in zip(match_df["best_match"], match_df["all_matched"])
+    ]
     if manual_site_matches:
         match_df["best_match"] = (
             match_df["sf_site"]
@@ -175,19 +180,33 @@ def process_data(
 
     # merge all huq dfs
     if isinstance(huq_dfs, list):
-        huq_df = pd.concat(huq_dfs).reset_index(drop=True)
+        huq_df = pd.concat(huq_dfs, ignore_index=True)
     else:
         huq_df = huq_dfs
 
-    # merge match data
+    # merge match data; only the name mapping is needed, the score and
+    # candidate-list columns would just be carried through every later merge
     huq_df = (
-        huq_df.merge(match_df, left_on="site_name", right_on="sf_site", how="left")
+        huq_df.merge(
+            match_df[["sf_site", "best_match"]],
+            left_on="site_name",
+            right_on="sf_site",
+            how="left",
+        )
         .dropna(subset=["best_match"])
         .drop(columns=["sf_site"])
-        .reset_index(drop=True)
     )  # Adding the best match name from ALVA.
 
-    # merge ground truth data
+    # merge ground truth data, keeping only the columns the attribute
+    # selection below would retain plus the merge keys
+    if attributes:
+        gt_df = gt_df[
+            [
+                col
+                for col in gt_df.columns
+                if col in attributes or col in ("site_name", "year")
+            ]
+        ]
     huq_df = (
         huq_df.merge(
             gt_df,
@@ -196,7 +215,6 @@ def process_data(
             how="left",
         )
         .dropna(subset=["gt_total_visits"])
-        .reset_index(drop=True)
     )  # Adding ground truth visitation numbers from ground truth data and dropping all those records where ground truth data is not available.
     huq_df = huq_df.drop(
         columns=["site_name_y"]
@@ -216,6 +234,9 @@ def process_data(
 
     # one hot encode
     if one_hot_columns:
-        huq_df = pd.get_dummies(huq_df, columns=one_hot_columns)
+        # categoricals let get_dummies build the indicator matrix from the
+        # integer codes, and uint8 indicators are an eighth of the default
+        huq_df[one_hot_columns] = huq_df[one_hot_columns].astype("category")
+        huq_df = pd.get_dummies(huq_df, columns=one_hot_columns, dtype=np.uint8)
 
     return huq_df
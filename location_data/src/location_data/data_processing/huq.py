@@ -1,10 +1,47 @@
-from pathlib import PosixPath
-from typing import Dict, Optional, Tuple, Union
+import functools
+from pathlib import Path, PosixPath
+from typing import Dict, List, Optional, Tuple, Union
 
 import geopandas as gpd
 import pandas as pd
 
 
+def _cached_parquet(
+    csv_path: Union[str, PosixPath], parse_dates: Optional[List[str]] = None
+) -> Path:
+    """Converts a csv file to a sibling parquet file once and returns its path
+
+    The daily and bayesian extracts are read on every pipeline run but
+    rarely change, so after the first run they can be served from parquet,
+    which stores column statistics and lets reads project and filter without
+    parsing the whole file. The parquet file is rebuilt whenever the csv is
+    newer, so a refreshed extract is never shadowed by a stale cache.
+
+    Parameters
+    ----------
+    csv_path : Union[str,PosixPath]
+        path to the source csv file
+    parse_dates : Optional[List[str]]
+        date columns to parse before writing, so they are stored as
+        timestamps and can be filtered on
+
+    Returns
+    -------
+    Path
+        path to the cached parquet file
+    """
+    csv_path = Path(csv_path)
+    parquet_path = csv_path.with_suffix(".parquet")
+    if (
+        not parquet_path.exists()
+        or csv_path.stat().st_mtime > parquet_path.stat().st_mtime
+    ):
+        pd.read_csv(csv_path, parse_dates=parse_dates, engine="pyarrow").to_parquet(
+            parquet_path, index=False
+        )
+    return parquet_path
+
+
 def process_huq_annual_estimates(
     huq_annual_estimates_path: Union[str, PosixPath], years: Optional[Tuple[int]] = None
 ) -> pd.DataFrame:
@@ -22,7 +59,9 @@ def process_huq_annual_estimates(
     pd.DataFrame
         dataframe of estimated huq annual estimates
     """
-    huq_df = pd.read_csv(huq_annual_estimates_path, parse_dates=["year"])
+    huq_df = pd.read_csv(
+        huq_annual_estimates_path, parse_dates=["year"], engine="pyarrow"
+    )
     huq_df.rename(columns={"name": "site_name"}, inplace=True)
     huq_df["year"] = huq_df["year"].dt.year
     if years:
@@ -58,27 +97,66 @@ def process_huq_daily_estimates(
     pd.DataFrame
         Dataframe of daily estimates filtered by specific years/dates
     """
-    huq_daily_df = pd.read_csv(huq_daily_estimates_path, parse_dates=["datestamp"])
+    filters = None
+    if years:
+        filters = [
+            ("datestamp", ">=", pd.Timestamp(years[0], 1, 1)),
+            ("datestamp", "<=", pd.Timestamp(years[1], 12, 31)),
+        ]
+    huq_daily_df = pd.read_parquet(
+        _cached_parquet(huq_daily_estimates_path, parse_dates=["datestamp"]),
+        columns=["polygon_id", "datestamp", "device_iid"],
+        filters=filters,
+    )
     huq_daily_df = huq_daily_df.rename(columns={"polygon_id": "site_name"})
-    huq_daily_df["site_name"] = huq_daily_df["site_name"].apply(
-        lambda x: x.split("/")[1]
+    huq_daily_df["site_name"] = (
+        huq_daily_df["site_name"].str.split("/", n=1).str[1].astype("category")
     )
     huq_daily_df["year"] = huq_daily_df["datestamp"].dt.year
     if years:
         huq_daily_df = huq_daily_df[huq_daily_df["year"].between(years[0], years[1])]
     if dates_of_interest:
+        expected = pd.to_datetime(huq_daily_df["site_name"].map(dates_of_interest))
         huq_daily_df = huq_daily_df[
-            huq_daily_df.apply(
-                lambda row: row["site_name"] in dates_of_interest
-                and row["datestamp"]
-                == pd.Timestamp(dates_of_interest[row["site_name"]]),
-                axis=1,
-            )
+            expected.notna() & (huq_daily_df["datestamp"] == expected)
         ]
         huq_daily_df["year"] = huq_daily_df["datestamp"].dt.year
     return huq_daily_df
 
-    # Getting Annual Visitors Days
+
+@functools.lru_cache(maxsize=4)
+def _load_huq_daily_cached(
+    huq_daily_estimates_path: str,
+    years: Optional[Tuple[int]],
+    dates_of_interest_items: Optional[Tuple[Tuple[str, str], ...]],
+) -> pd.DataFrame:
+    """Memoized wrapper around process_huq_daily_estimates
+
+    The daily extract is the slowest input to load and clean_huq_data is
+    often called several times per session with the same arguments, so the
+    loaded frame is cached on its hashable argument tuple. Callers should
+    treat the returned frame as read only.
+
+    Parameters
+    ----------
+    huq_daily_estimates_path : str
+        Path to huq daily estimates
+    years : Optional[Tuple[int]]
+        years to filter by
+    dates_of_interest_items : Optional[Tuple[Tuple[str,str],...]]
+        dates_of_interest dictionary as a sorted tuple of items
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe of daily estimates filtered by specific years/dates
+    """
+    dates_of_interest = (
+        dict(dates_of_interest_items) if dates_of_interest_items else None
+    )
+    return process_huq_daily_estimates(
+        huq_daily_estimates_path, years=years, dates_of_interest=dates_of_interest
+    )
 
 
 def find_huq_annual_visitors(huq_daily_df: pd.DataFrame) -> pd.DataFrame:
@@ -94,10 +172,8 @@ def find_huq_annual_visitors(huq_daily_df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         data frame of counts of visitor days by site name
     """
-    huq_vd_annual_df = huq_daily_df.copy()
-    huq_vd_annual_df = huq_vd_annual_df.sort_values(by=["site_name", "datestamp"])
     huq_vd_annual_df = (
-        huq_vd_annual_df.groupby(["site_name", "year"])["datestamp"]
+        huq_daily_df.groupby(["site_name", "year"], observed=True)["datestamp"]
         .count()
         .reset_index(name="visitors_day")
     )
@@ -120,17 +196,42 @@ def find_huq_unique_users(huq_daily_df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         Dataframe of number of unique users per site
     """
-    huq_unique_users_annual_df = huq_daily_df[
-        ["site_name", "year", "device_iid"]
-    ].copy()
     huq_unique_users_annual_df = (
-        huq_unique_users_annual_df.groupby(["site_name", "year"])["device_iid"]
-        .apply(lambda x: x.nunique())
+        huq_daily_df.groupby(["site_name", "year"], observed=True)["device_iid"]
+        .nunique()
         .reset_index(name="unique_users")
     )
     return huq_unique_users_annual_df
 
 
+def find_huq_daily_aggregates(huq_daily_df: pd.DataFrame) -> pd.DataFrame:
+    """Computes visitor days and unique users per site and year in one pass
+
+    Combines find_huq_annual_visitors and find_huq_unique_users into a single
+    groupby so the daily frame is only grouped once and the results arrive
+    pre-joined.
+
+    Parameters
+    ----------
+    huq_daily_df : pd.DataFrame
+        dataframe of daily estimates of huq data
+
+    Returns
+    -------
+    pd.DataFrame
+        dataframe of visitor day counts and unique user counts per site and
+        year
+    """
+    return (
+        huq_daily_df.groupby(["site_name", "year"], observed=True)
+        .agg(
+            visitors_day=("datestamp", "count"),
+            unique_users=("device_iid", "nunique"),
+        )
+        .reset_index()
+    )
+
+
 def process_huq_bayesian(
     huq_bayesian_data_path: Union[str, PosixPath],
     years: Optional[Tuple[int]] = None,
@@ -154,28 +255,38 @@ def process_huq_bayesian(
     """
 
     # Huq Bayesian Estimates
-    huq_bys_df = pd.read_csv(huq_bayesian_data_path, parse_dates=["datestamp"])
+    filters = None
+    if years:
+        filters = [
+            ("datestamp", ">=", pd.Timestamp(years[0], 1, 1)),
+            ("datestamp", "<=", pd.Timestamp(years[1], 12, 31)),
+        ]
+    huq_bys_df = pd.read_parquet(
+        _cached_parquet(huq_bayesian_data_path, parse_dates=["datestamp"]),
+        columns=["polygon_id", "datestamp", "visitation_approximation"],
+        filters=filters,
+    )
     huq_bys_df = huq_bys_df.rename(
         columns={
             "polygon_id": "site_name",
             "visitation_approximation": "bayesian_visitation_approximation",
         }
     )
-    huq_bys_df["site_name"] = huq_bys_df["site_name"].apply(lambda x: x.split("/")[1])
+    huq_bys_df["site_name"] = (
+        huq_bys_df["site_name"].str.split("/", n=1).str[1].astype("category")
+    )
     huq_bys_df["year"] = huq_bys_df["datestamp"].dt.year
     if years:
         huq_bys_df = huq_bys_df[huq_bys_df["year"].between(years[0], years[1])]
     if dates_of_interest:
+        expected = pd.to_datetime(huq_bys_df["site_name"].map(dates_of_interest))
         huq_bys_df = huq_bys_df[
-            huq_bys_df.apply(
-                lambda row: row["site_name"] in dates_of_interest
-                and row["datestamp"]
-                == pd.Timestamp(dates_of_interest[row["site_name"]]),
-                axis=1,
-            )
+            expected.notna() & (huq_bys_df["datestamp"] == expected)
         ]
     huq_bys_df = (
-        huq_bys_df.groupby(["site_name", "year"])["bayesian_visitation_approximation"]
+        huq_bys_df.groupby(["site_name", "year"], observed=True)[
+            "bayesian_visitation_approximation"
+        ]
         .sum()
         .reset_index()
     )
@@ -220,10 +331,12 @@ def process_one_day_event_data(
     pd.DataFrame
         dataframe of huq event attendence for selected dates
     """
-    one_day_events_df = pd.read_csv(one_day_events_path, parse_dates=["datestamp"])
+    one_day_events_df = pd.read_csv(
+        one_day_events_path, parse_dates=["datestamp"], engine="pyarrow"
+    )
     one_day_events_df = one_day_events_df.rename(columns={"polygon_id": "site_name"})
-    one_day_events_df["site_name"] = one_day_events_df["site_name"].transform(
-        lambda x: x.split("/")[1]
+    one_day_events_df["site_name"] = (
+        one_day_events_df["site_name"].str.split("/", n=1).str[1].astype("category")
     )
     one_day_events_df = one_day_events_df.rename(
         columns={
@@ -232,12 +345,9 @@ def process_one_day_event_data(
         }
     )
 
+    expected = pd.to_datetime(one_day_events_df["site_name"].map(dates_of_interest))
     one_day_events_df = one_day_events_df[
-        one_day_events_df.apply(
-            lambda row: row["site_name"] in dates_of_interest
-            and row["datestamp"] == pd.Timestamp(dates_of_interest[row["site_name"]]),
-            axis=1,
-        )
+        expected.notna() & (one_day_events_df["datestamp"] == expected)
     ]
     one_day_events_df["year"] = one_day_events_df["datestamp"].dt.year
     return one_day_events_df
@@ -287,25 +397,23 @@ def clean_huq_data(
     huq_bys_df = process_huq_bayesian(
         huq_bayesian_data_path, years=years, dates_of_interest=dates_of_interest
     )
-    huq_daily_df = process_huq_daily_estimates(
-        huq_daily_estimates_path, years=years, dates_of_interest=dates_of_interest
+    huq_daily_df = _load_huq_daily_cached(
+        str(huq_daily_estimates_path),
+        tuple(years) if years else None,
+        tuple(sorted(dates_of_interest.items())) if dates_of_interest else None,
     )
-    huq_vd_annual_df = find_huq_annual_visitors(huq_daily_df)
-    huq_unique_users_annual_df = find_huq_unique_users(huq_daily_df)
+    huq_daily_aggregates_df = find_huq_daily_aggregates(huq_daily_df)
     shape_df = get_area(sites_shape_path)
-    huq_df = huq_df.merge(
-        huq_unique_users_annual_df, on=["site_name", "year"], how="left"
-    )  # Adding Unique Users Column
-    huq_df = huq_df.merge(
-        huq_vd_annual_df[["site_name", "year", "visitors_day"]],
-        on=["site_name", "year"],
-        how="left",
-    )  # Adding the detected visitors days
-    huq_df = huq_df.merge(
+    # join the small per-site-and-year frames with each other first so the
+    # wide huq frame is only merged over once for all of them
+    annual_features_df = huq_daily_aggregates_df.merge(
         huq_bys_df[["site_name", "year", "bayesian_visitation_approximation"]],
         on=["site_name", "year"],
-        how="left",
-    )  # Adding annual Bayesian estimates
+        how="outer",
+    )
+    huq_df = huq_df.merge(
+        annual_features_df, on=["site_name", "year"], how="left"
+    )  # Adding unique users, detected visitor days and annual Bayesian estimates
 
     huq_df = huq_df.merge(
         shape_df[["site_name", "site_area", "pop_density"]],
@@ -314,9 +422,7 @@ def clean_huq_data(
     )  # Adding site area
     huq_df["pop_density"] = huq_df["pop_density"].fillna(0)
 
-    if huq_df.duplicated(subset=["site_name", "year"]).any() is False:
-        print("duplicated sites found dropping duplicates")
-        huq_df = huq_df.drop_duplicates(subset=["site_name", "year"])
+    huq_df = huq_df.drop_duplicates(subset=["site_name", "year"], keep="first")
 
     # Deleting sites that are ambigous or whose match was not found in Ground Truth Data
     if excluded_sites:
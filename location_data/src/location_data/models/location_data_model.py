@@ -1,15 +1,99 @@
 import os
-import pickle
-from typing import Literal, Optional, Union
+from typing import List, Literal, Optional, Union
 
+import joblib
 import numpy as np
 import pandas as pd
+from numba import njit, prange
+
+try:
+    # optional drop-in Intel backend; patching must happen before the
+    # sklearn estimators below are imported to take effect
+    from sklearnex import patch_sklearn
+
+    patch_sklearn()
+except ImportError:
+    pass
+
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVR
 from xgboost import XGBRegressor
 
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    convert_sklearn = None
+
+
+def _flatten_forest(forest) -> tuple:
+    """Packs a fitted sklearn forest into flat structure-of-arrays form
+
+    Concatenates every tree's node arrays behind an offsets vector so the
+    jitted predict kernel can walk the whole ensemble over plain numpy
+    buffers without touching python tree objects.
+
+    Parameters
+    ----------
+    forest : RandomForestRegressor
+        fitted forest to flatten
+
+    Returns
+    -------
+    tuple
+        (feature, threshold, children_left, children_right, value, offsets)
+        arrays covering all trees
+    """
+    features = []
+    thresholds = []
+    lefts = []
+    rights = []
+    values = []
+    offsets = np.zeros(len(forest.estimators_) + 1, dtype=np.int64)
+    for i, estimator in enumerate(forest.estimators_):
+        tree = estimator.tree_
+        features.append(tree.feature.astype(np.int64))
+        thresholds.append(tree.threshold)
+        lefts.append(tree.children_left.astype(np.int64))
+        rights.append(tree.children_right.astype(np.int64))
+        values.append(tree.value[:, 0, 0])
+        offsets[i + 1] = offsets[i] + tree.feature.shape[0]
+    return (
+        np.concatenate(features),
+        np.concatenate(thresholds),
+        np.concatenate(lefts),
+        np.concatenate(rights),
+        np.concatenate(values),
+        offsets,
+    )
+
+
+@njit(cache=True, nogil=True, parallel=True)
+def _forest_predict(X, feature, threshold, left, right, value, offsets):
+    """Averages the leaf values reached by each sample across all trees"""
+    n_samples = X.shape[0]
+    n_trees = offsets.shape[0] - 1
+    out = np.empty(n_samples)
+    for i in prange(n_samples):
+        acc = 0.0
+        for t in range(n_trees):
+            node = offsets[t]
+            while left[node] != -1:
+                if X[i, feature[node]] <= threshold[node]:
+                    node = offsets[t] + left[node]
+                else:
+                    node = offsets[t] + right[node]
+            acc += value[node]
+        out[i] = acc / n_trees
+    return out
+
 
 class LocationDataModel:
     def __init__(
@@ -27,7 +111,8 @@ class LocationDataModel:
         model : Literal[linear_model,SVM,random_forest,xgb_model]
             string of model to be loaded
         load_path : Optional[str]
-            path to pretrained model
+            path to pretrained model; a .onnx file (exported by save for
+            random forests) is served through onnxruntime
         scaler_path_x : Optional[str]
             path to scaler for x variables, only when loading pretrained SVM model
         scaler_path_y : Optional[str]
@@ -44,13 +129,17 @@ class LocationDataModel:
         location_data_base_models = {
             "linear_model": LinearRegression(),
             "SVM": SVR(kernel="linear", C=1.5, epsilon=0.001),
-            "random_forest": RandomForestRegressor(n_estimators=100, random_state=42),
+            "random_forest": RandomForestRegressor(
+                n_estimators=100, random_state=42, n_jobs=-1
+            ),
             "xgb_model": XGBRegressor(
                 n_estimators=100,  # Number of trees
                 learning_rate=0.1,  # Step size
                 max_depth=3,  # Maximum depth of a tree
                 objective="reg:squarederror",  # Objective for regression
                 random_state=42,
+                n_jobs=-1,
+                tree_method="hist",  # Histogram split finding
             ),
         }
 
@@ -67,23 +156,38 @@ class LocationDataModel:
                 "trying to load SVM without loading associated trained scalers"
             )
         self.model_type = model
+        self._onnx_session = None
+        self._forest_arrays = None
         if load_path:
             if self.model_type == "xgb_model":
                 self.model = XGBRegressor()
                 self.model.load_model(load_path)
+            elif load_path.endswith(".onnx"):
+                if onnxruntime is None:
+                    raise ValueError(
+                        "loading an .onnx model requires onnxruntime to be installed"
+                    )
+                self._onnx_session = onnxruntime.InferenceSession(
+                    load_path, providers=["CPUExecutionProvider"]
+                )
+                self.model = None
             else:
-                with open(load_path, "rb") as f:
-                    self.model = pickle.load(f)
+                # mmap the numpy arrays inside the model instead of copying
+                # them into fresh allocations; pages are shared across
+                # processes loading the same file
+                self.model = joblib.load(load_path, mmap_mode="r")
+                if self.model_type == "random_forest":
+                    self._forest_arrays = _flatten_forest(self.model)
             if self.model_type == "SVM":
-                with open(scaler_path_x, "rb") as f:
-                    self.scaler_x = pickle.load(f)
-                with open(scaler_path_y, "rb") as f:
-                    self.scaler_y = pickle.load(f)
+                self.scaler_x = joblib.load(scaler_path_x, mmap_mode="r")
+                self.scaler_y = joblib.load(scaler_path_y, mmap_mode="r")
         else:
             self.model = location_data_base_models[model]
             if self.model_type == "SVM":
-                self.scaler_x = StandardScaler()
-                self.scaler_y = StandardScaler()
+                # copy=False lets the scalers shift and scale in place; fit
+                # and predict hand them float64 copies they own
+                self.scaler_x = StandardScaler(copy=False)
+                self.scaler_y = StandardScaler(copy=False)
 
     def fit(self, X: Union[pd.Series, np.array], y: Union[pd.Series, np.array]):
         """Fits location model
@@ -96,12 +200,18 @@ class LocationDataModel:
             values to predict
         """
         if self.model_type == "SVM":
-            X_train = self.scaler_x.fit_transform(X.values)
-            y_train = self.scaler_y.fit_transform(y.values.reshape(-1, 1)).ravel()
+            X_train = self.scaler_x.fit_transform(
+                np.array(X.values, dtype=np.float64)
+            )
+            y_train = self.scaler_y.fit_transform(
+                np.array(y.values, dtype=np.float64).reshape(-1, 1)
+            ).ravel()
         else:
             X_train = X
             y_train = y
         self.model.fit(X_train, y_train)
+        if self.model_type == "random_forest":
+            self._forest_arrays = _flatten_forest(self.model)
 
     def predict(self, X: Union[pd.Series, np.array]) -> np.array:
         """Predicts attendence at events
@@ -116,13 +226,42 @@ class LocationDataModel:
         np.array
             predicted attendences
         """
+        if self._onnx_session is not None:
+            input_name = self._onnx_session.get_inputs()[0].name
+            return self._onnx_session.run(
+                None, {input_name: np.asarray(X, dtype=np.float32)}
+            )[0].ravel()
+        if self._forest_arrays is not None:
+            X_flat = np.ascontiguousarray(np.asarray(X, dtype=np.float64))
+            return _forest_predict(X_flat, *self._forest_arrays)
         if self.model_type == "SVM":
-            X = self.scaler_x.transform(X)
+            X = self.scaler_x.transform(np.array(X, dtype=np.float64))
         y_pred = self.model.predict(X)
         if self.model_type == "SVM":
             y_pred = self.scaler_y.inverse_transform(y_pred.reshape(-1, 1)).ravel()
         return y_pred
 
+    def predict_many(self, Xs: List[np.array]) -> List[np.array]:
+        """Predicts attendences for several feature batches in one call
+
+        Stacks the batches, runs a single predict and splits the result, so
+        callers looping over events or sites pay the model's per-call
+        overhead once instead of once per batch.
+
+        Parameters
+        ----------
+        Xs : List[np.array]
+            list of 2d feature arrays with matching columns
+
+        Returns
+        -------
+        List[np.array]
+            predicted attendences for each input batch, in order
+        """
+        sizes = [len(X) for X in Xs]
+        y_pred = self.predict(np.vstack(Xs))
+        return np.split(y_pred, np.cumsum(sizes)[:-1])
+
     def save(self, model_path: str):
         """Saves either a pkl or json (xgb_models) at
         `model_path/model_name.pkl` or `model_path/model_name.json`
@@ -137,13 +276,26 @@ class LocationDataModel:
             self.model.save_model(model_save)
         else:
             model_save = os.path.join(model_path, f"{self.model_type}.pkl")
-            with open(model_save, "wb") as f:
-                pickle.dump(self.model, f)
+            # compress=0 keeps the arrays stored raw so loads can mmap them
+            joblib.dump(self.model, model_save, compress=0)
+            if self.model_type == "random_forest" and convert_sklearn is not None:
+                # also export the forest for the onnxruntime predict path,
+                # which walks the trees far faster than sklearn
+                onnx_model = convert_sklearn(
+                    self.model,
+                    initial_types=[
+                        (
+                            "input",
+                            FloatTensorType([None, self.model.n_features_in_]),
+                        )
+                    ],
+                )
+                onnx_save = os.path.join(model_path, f"{self.model_type}.onnx")
+                with open(onnx_save, "wb") as f:
+                    f.write(onnx_model.SerializeToString())
             if self.model_type == "SVM":
                 scaler_x_path = os.path.join(model_path, "scaler_x.pkl")
                 scaler_y_path = os.path.join(model_path, "scaler_y.pkl")
-                with open(scaler_x_path, "wb") as f:
-                    pickle.dump(self.scaler_x, f)
-                with open(scaler_y_path, "wb") as f:
-                    pickle.dump(self.scaler_y, f)
+                joblib.dump(self.scaler_x, scaler_x_path, compress=0)
+                joblib.dump(self.scaler_y, scaler_y_path, compress=0)
         print(f"Saving model at {model_save}")
@@ -6,7 +6,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
-from shapely.wkt import loads
+from shapely import STRtree
 
 plt.style.use("ggplot")
 plt.rcParams["axes.facecolor"] = "white"
@@ -45,15 +45,19 @@ def plot_demographic_heat_map(test_df: pd.DataFrame, site_name: str):
     the 'Natural History Museum' across different deprivation levels and years.
 
     """
-    tdf = test_df[test_df["site_name"] == site_name]
+    tdf = test_df[test_df["site_name"] == site_name].copy()
+    # categorical keys hash as small integer codes rather than python strings
+    for col in ["year", "site_name", "LA_decile"]:
+        tdf[col] = tdf[col].astype("category")
     df = (
-        tdf.groupby(["year", "site_name", "LA_decile"])
+        tdf.groupby(["year", "site_name", "LA_decile"], observed=True)
         .size()
         .reset_index(name="visits")
     )
-    df["visits_perc"] = df.groupby(["year", "site_name"])["visits"].transform(
-        lambda x: (x / x.sum()) * 100
+    group_sum = df.groupby(["year", "site_name"], observed=True)["visits"].transform(
+        "sum"
     )
+    df["visits_perc"] = (df["visits"] / group_sum) * 100
     plt.figure(figsize=(15, 7))
     pivot_df = df.pivot_table(index="year", columns="LA_decile", values="visits_perc")
     sns.heatmap(
@@ -112,15 +116,17 @@ def plot_catchment_map(
       for better visualization of variations across different regions.
     - The function is designed for **spatial analysis** of visitor trends and geographic coverage.
     """
-    tdf = site_df[site_df["site_name"] == site_name]
+    tdf = site_df[site_df["site_name"] == site_name].copy()
+    for col in ["site_name", "year", "geo_code"]:
+        tdf[col] = tdf[col].astype("category")
     tdf = (
-        tdf.groupby(["site_name", "year", "geo_code"])["device_iid"]
+        tdf.groupby(["site_name", "year", "geo_code"], observed=True)["device_iid"]
         .count()
         .reset_index(name="n_visitors")
     )
-    tdf["total_visitors"] = tdf.groupby(["site_name", "year"])["n_visitors"].transform(
-        lambda x: sum(x)
-    )
+    tdf["total_visitors"] = tdf.groupby(["site_name", "year"], observed=True)[
+        "n_visitors"
+    ].transform("sum")
     tdf["pct_total"] = (tdf["n_visitors"] / tdf["total_visitors"]) * 100
     _, ax = plt.subplots(2, 3, figsize=(20, 15))
     plt.subplots_adjust(hspace=0.9)
@@ -217,14 +223,21 @@ def huq_plotting_data(
     test_df["site_name"] = test_df["site_name"].apply(lambda x: x.split("/")[1])
     if test_sites:
         test_df = test_df[test_df["site_name"].isin(test_sites)]
-    test_df["geometry"] = test_df["home_geog"].apply(lambda x: loads(x))
+    test_df["geometry"] = gpd.GeoSeries.from_wkt(test_df["home_geog"])
     test_df = test_df.drop(columns=["home_geog"])
     test_df = gpd.GeoDataFrame(test_df, geometry="geometry", crs="EPSG:4326")
-    test_df = gpd.sjoin(
-        test_df,
-        uk_shp_df[["geo_code", "geometry", "LA_decile"]],
-        how="left",
-        predicate="intersects",
+    # query the STRtree over the LSOA polygons directly rather than going
+    # through gpd.sjoin; one vectorized call returns all intersecting pairs
+    tree = STRtree(np.asarray(uk_shp_df.geometry.values))
+    point_idx, poly_idx = tree.query(
+        np.asarray(test_df.geometry.values), predicate="intersects"
+    )
+    matched = pd.DataFrame(
+        {
+            "geo_code": uk_shp_df["geo_code"].to_numpy()[poly_idx],
+            "LA_decile": uk_shp_df["LA_decile"].to_numpy()[poly_idx],
+        },
+        index=test_df.index[point_idx],
     )
-    test_df = test_df.drop(columns=["index_right"])
+    test_df = test_df.join(matched)
     return test_df
@@ -1,6 +1,8 @@
-import re
 from typing import Optional
 
+import ahocorasick
+import numpy as np
+import orjson
 import pandas as pd
 from utils import obfuscate_text
 
@@ -14,23 +16,57 @@ COLUMN_MAP = {
 }
 
 
-def clean_data(data: pd.DataFrame, whitelist: Optional[pd.Dataframe]) -> pd.DataFrame:
-    if whitelist:
-        whitelist["handle"] = whitelist["handle"].apply(lambda x: re.sub(" ", "", x))
+def _as_list(value) -> list:
+    """Returns a media cell as a list.
+
+    Posts straight from the pipeline already carry real lists; frames read
+    back from csv carry the python-literal string repr, which is parsed once
+    here. Missing values become the empty list.
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and len(value) > 2:
+        return orjson.loads(value.replace("'", '"'))
+    return []
+
+
+def clean_data(data: pd.DataFrame, whitelist: Optional[pd.DataFrame]) -> pd.DataFrame:
+    if whitelist is not None:
+        whitelist["handle"] = whitelist["handle"].str.replace(" ", "", regex=False)
         whitelist["hash"] = whitelist["handle"].apply(lambda x: obfuscate_text(x))
-        for _, row in whitelist.iterrows():
-            data["content"] = data["content"].str.replace(row["hash"], row["handle"])
+        # one automaton scan per post replaces every whitelisted hash; the
+        # old loop rescanned the whole content column once per whitelist row.
+        # Series.replace with a hash->handle dict is not an option here: it
+        # only maps cells whose entire value matches, and the hashes sit
+        # inside the post text
+        automaton = ahocorasick.Automaton()
+        for handle, hashed in zip(whitelist["handle"], whitelist["hash"]):
+            automaton.add_word(hashed, (len(hashed), handle))
+        automaton.make_automaton()
+
+        def restore_handles(text: str) -> str:
+            parts = []
+            prev_end = 0
+            for end, (length, handle) in automaton.iter(text):
+                start = end - length + 1
+                if start < prev_end:
+                    continue
+                parts.append(text[prev_end:start])
+                parts.append(handle)
+                prev_end = end + 1
+            parts.append(text[prev_end:])
+            return "".join(parts)
+
+        # posts with empty content come back from read_csv as NaN; skip them
+        # rather than feeding floats to the automaton
+        data["content"] = data["content"].map(restore_handles, na_action="ignore")
     data = data.rename(columns=COLUMN_MAP)
-    data["entities.media"] = [
-        "photo" if len(row["images"]) > 2 else "" for _, row in data.iterrows()
-    ]
-    data["entities.media"] = [
-        f"{row['entities.media']} video"
-        if len(row["videos"]) > 2
-        else row["entities.media"]
-        for _, row in data.iterrows()
-    ]
-    data["images"] = data["images"].apply(
-        lambda x: eval(x)[0]["url"] if len(x) > 2 else ""
+    images = data["images"].map(_as_list)
+    videos = data["videos"].map(_as_list)
+    img_has = (images.map(len) > 0).to_numpy()
+    vid_has = (videos.map(len) > 0).to_numpy()
+    data["entities.media"] = np.where(img_has, "photo", "").astype(object) + np.where(
+        vid_has, np.where(img_has, " video", "video"), ""
     )
+    data["images"] = [imgs[0]["url"] if imgs else "" for imgs in images]
     return data
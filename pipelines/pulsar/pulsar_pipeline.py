@@ -1,12 +1,16 @@
 import argparse
 import asyncio
+import hashlib
 import json
 import math
 import os
 from datetime import datetime
-from typing import Generator, List
+from typing import Generator
 
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from clean_pulsar_data import clean_data
 from dotenv import load_dotenv
 from gql import Client, gql
@@ -14,10 +18,9 @@ from gql.client import AsyncClientSession
 from gql.transport.aiohttp import AIOHTTPTransport
 from loguru import logger
 from utils import (
-    PermittedAlgorithms,
+    PULSAR_VARIABLE_DTYPES,
     check_query_variables,
     obfuscate_tagged_users,
-    obfuscate_text,
 )
 
 load_dotenv()
@@ -25,6 +28,13 @@ load_dotenv()
 PULSAR_URL = "https://data.pulsarplatform.com/graphql/trac"
 PULSAR_API = os.environ.get("PULSAR_API_KEY")
 
+# arrow column types for the csv writer, keyed by the pandas dtypes in
+# PULSAR_VARIABLE_DTYPES; every unlisted variable is written as string
+_ARROW_VARIABLE_TYPES = {
+    "Int64": pa.int64(),
+    "float64": pa.float64(),
+}
+
 
 class _PulsarClient:
     _session: AsyncClientSession
@@ -55,14 +65,20 @@ class _PulsarClient:
         Generator
         dictionary of returned posts from search
         """
-        cursor = None
-        fetched_pages = 0
-        max_retries = 3
-        retry_delay = 60
-        total_filtered_post_count = 0
-        total_pages = 0
-        while True:
+        # pages go through a small bounded queue fed by a producer task, so
+        # the next GraphQL request is already in flight while the current
+        # page's posts are being obfuscated and consumed
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+        async def produce_pages():
             try:
+                cursor = None
+                fetched_pages = 0
+                max_retries = 3
+                retry_delay = 60
+                total_pages = 0
+                # the document only changes with query_variables, so parse and
+                # validate it once rather than per page
                 query = gql(
                     """
                     query ResultsBy($filters: FilterInput!, $options: ResultsOptionsInput!) {
@@ -78,61 +94,100 @@ class _PulsarClient:
                             }
                     """
                 )
-                params = {
-                    "filters": {
-                        "searchIds": [search_id],
-                        "dateFrom": start,
-                        "dateTo": end,
-                    },
-                    "options": {
-                        "limit": limit,
-                        "cursor": cursor,
-                    },
-                }
-                result = await self._session.execute(
-                    query,
-                    variable_values=params,
-                    operation_name="ResultsBy",
-                )
-                if len(result["results"]["results"]) == 0:
-                    # If no more results, break the loop
-                    break
-                for p in result["results"]["results"]:
-                    total_filtered_post_count += 1
+                while True:
                     try:
-                        p["userScreenName"] = obfuscate_text(
-                            p["userScreenName"],
-                            algorithm=PermittedAlgorithms.sha256,
+                        params = {
+                            "filters": {
+                                "searchIds": [search_id],
+                                "dateFrom": start,
+                                "dateTo": end,
+                            },
+                            "options": {
+                                "limit": limit,
+                                "cursor": cursor,
+                            },
+                        }
+                        result = await self._session.execute(
+                            query,
+                            variable_values=params,
+                            operation_name="ResultsBy",
                         )
-                        p["content"] = obfuscate_tagged_users(text=p["content"])
-
-                        yield p
                     except Exception as e:
-                        logger.error(f"Unable to parse post {p} with error {e}")
+                        # Handle the timeout error here asyncio error not catching for some reason
+                        print(f"error {e}")
+                        print("Timeout error. Retrying...")
+                        await asyncio.sleep(retry_delay)
+                        max_retries -= 1
+                        if max_retries <= 0:
+                            print("Max retry attempts reached. Exiting.")
+                            break
                         continue
-            except Exception as e:
-                # Handle the timeout error here asyncio error not catching for some reason
-                print(f"error {e}")
-                print("Timeout error. Retrying...")
-                print("last collected: ", p["publishedAt"])
-                await asyncio.sleep(retry_delay)
-                max_retries -= 1
-                if max_retries <= 0:
-                    print("Max retry attempts reached. Exiting.")
-                    break
-            if "nextCursor" in result["results"]:
-                cursor = result["results"]["nextCursor"]
-            else:
+                    if len(result["results"]["results"]) == 0:
+                        # If no more results, break the loop
+                        break
+                    await page_queue.put(result["results"]["results"])
+                    if "nextCursor" in result["results"]:
+                        cursor = result["results"]["nextCursor"]
+                    else:
+                        break
+                    total_pages = math.ceil(result["results"]["total"] / 100)
+                    fetched_pages += 1
+                    (f"{fetched_pages} /{total_pages} collected, ")
+            finally:
+                # the consumer blocks on the queue until it sees the
+                # sentinel, so it must go in even when the producer dies
+                # outside the retried execute call; the exception itself
+                # is re-raised by the await on the producer task below
+                await page_queue.put(None)
+
+        producer = asyncio.ensure_future(produce_pages())
+        total_filtered_post_count = 0
+        while True:
+            page = await page_queue.get()
+            if page is None:
                 break
-            total_pages = math.ceil(result["results"]["total"] / 100)
-            fetched_pages += 1
-            (f"{fetched_pages} /{total_pages} collected, ")
+            # hash the whole page of screen names in one comprehension with
+            # the constructor bound locally; going through obfuscate_text per
+            # post cost more in dispatch than the sha256 itself
+            sha256 = hashlib.sha256
+            name_hashes = [
+                sha256(p["userScreenName"].encode()).hexdigest()
+                if isinstance(p.get("userScreenName"), str)
+                else None
+                for p in page
+            ]
+            for p, name_hash in zip(page, name_hashes):
+                total_filtered_post_count += 1
+                try:
+                    if name_hash is None:
+                        raise KeyError("userScreenName")
+                    p["userScreenName"] = name_hash
+                    p["content"] = obfuscate_tagged_users(text=p["content"])
+                    if isinstance(p.get("images"), str):
+                        # normalise images to a real list at ingest so
+                        # downstream cleaning does not reparse string reprs
+                        p["images"] = orjson.loads(p["images"].replace("'", '"'))
+
+                    yield p
+                except Exception as e:
+                    logger.error(f"Unable to parse post {p} with error {e}")
+                    continue
+        await producer
 
 
 async def client(
-    search_id: str, start_date: str, end_date: str, query_variables: str, limit: int
-) -> List[dict]:
-    """client to get pulsar data
+    search_id: str,
+    start_date: str,
+    end_date: str,
+    query_variables: str,
+    limit: int,
+    output_path: str,
+) -> int:
+    """client to get pulsar data and stream it to csv
+
+    Posts are written as they arrive instead of being collected into one
+    list, so memory stays bounded by a single post however large the search
+    is and disk writes overlap the network wait.
 
     Parameters
     ----------
@@ -146,11 +201,13 @@ async def client(
         list of variables to include
     limit : int
         limit
+    output_path : str
+        csv file to stream the posts to
 
     Returns
     -------
-    List[dict]
-        pulsar results
+    int
+        number of posts written
     """
     transport = AIOHTTPTransport(
         url=PULSAR_URL, headers={"Authorization": "Bearer {}".format(PULSAR_API)}
@@ -168,11 +225,52 @@ async def client(
             limit=limit,
             query_variables=query_variables,
         )
-        result_list = []
-        async for post in results:
-            result_list.append(post)
+        n_posts = 0
+        batch = []
+        # the field set is fixed by query_variables, so the schema is known
+        # up front; inferring it from the first batch would lock all-null
+        # sparse fields to the null type and make a later non-null value
+        # fail the whole collection
+        schema = pa.schema(
+            [
+                (
+                    name,
+                    _ARROW_VARIABLE_TYPES.get(
+                        PULSAR_VARIABLE_DTYPES.get(name), pa.string()
+                    ),
+                )
+                for name in query_variables.split()
+            ]
+        )
+        string_fields = {
+            field.name for field in schema if field.type == pa.string()
+        }
+        writer = pacsv.CSVWriter(output_path, schema)
+        try:
+            async for post in results:
+                # arrow's csv writer has no nested types, so lists, dicts
+                # and anything else bound for a string column keep the repr
+                # form the old csv module produced
+                batch.append(
+                    {
+                        key: str(value)
+                        if key in string_fields
+                        and value is not None
+                        and not isinstance(value, str)
+                        else value
+                        for key, value in post.items()
+                    }
+                )
+                n_posts += 1
+                if len(batch) >= 1000:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        finally:
+            writer.close()
 
-    return result_list
+    return n_posts
 
 
 if __name__ == "__main__":
@@ -205,16 +303,20 @@ if __name__ == "__main__":
     else:
         output_path = f'{search_id}_{datetime.now().strftime("%Y_%m_%d_%H_%M_%S")}.csv'
 
-    result_list = asyncio.run(
-        client(search_id, start_date, end_date, query_variables, limit)
+    asyncio.run(
+        client(search_id, start_date, end_date, query_variables, limit, output_path)
     )
 
-    result_df = pd.DataFrame(result_list)
-    result_df.to_csv(output_path, index=False)
     if opts.clean_data_path:
         if opts.white_list_path:
-            whitelist = pd.read(opts.white_list_path)
+            whitelist = pd.read_csv(opts.white_list_path)
         else:
             whitelist = None
+        dtypes = {
+            variable: dtype
+            for variable, dtype in PULSAR_VARIABLE_DTYPES.items()
+            if variable in query_variables.split()
+        }
+        result_df = pd.read_csv(output_path, dtype=dtypes)
         cleaned_data = clean_data(result_df, whitelist)
         cleaned_data.to_csv(opts.clean_data_path)
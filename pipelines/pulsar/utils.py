@@ -3,7 +3,9 @@ import re
 from enum import Enum
 from typing import Callable, List, Optional
 
-from pydantic import validate_arguments
+# matches @mentions and reddit-style u/mentions; compiled once so the pulsar
+# post loop does not pay a pattern-cache lookup per post
+_MENTION_RE = re.compile(r"(?<![a-zA-Z0-9])(?:@|(?:u/))([a-zA-Z0-9_]+)")
 
 PULSAR_VARIABLES = [
     "aiModules",
@@ -115,6 +117,43 @@ PULSAR_VARIABLES = [
     "visibilityInfo",
 ]
 
+_PULSAR_VARIABLES_SET = frozenset(PULSAR_VARIABLES)
+
+# explicit dtypes for the numeric pulsar fields so frames built from
+# collected posts skip per-column type inference; nullable Int64 covers the
+# counts pulsar leaves empty, everything unlisted stays object
+PULSAR_VARIABLE_DTYPES = {
+    "alexaRank": "Int64",
+    "ave": "float64",
+    "cachedReactionCount": "Int64",
+    "circulation": "Int64",
+    "commentsCount": "Int64",
+    "credibilityScore": "float64",
+    "duration": "float64",
+    "engagement": "Int64",
+    "engagementRate": "float64",
+    "femaleAudience": "float64",
+    "impressions": "Int64",
+    "intensity": "float64",
+    "latitude": "float64",
+    "likesCount": "Int64",
+    "longitude": "float64",
+    "maleAudience": "float64",
+    "mediaImpressions": "Int64",
+    "mediaReach": "Int64",
+    "otherAudience": "float64",
+    "potentialReach": "Int64",
+    "reviewRating": "float64",
+    "sharesCount": "Int64",
+    "socialImpressions": "Int64",
+    "syndicationContentsCount": "Int64",
+    "userFollowersCount": "Int64",
+    "userFriendsCount": "Int64",
+    "userLatitude": "float64",
+    "userLongitude": "float64",
+    "viewsCount": "Int64",
+}
+
 
 def check_query_variables(query_variables: List[str]) -> str:
     """_summary_
@@ -138,7 +177,7 @@ def check_query_variables(query_variables: List[str]) -> str:
     """
     filtered_variables = []
     for variable in query_variables:
-        if variable in PULSAR_VARIABLES:
+        if variable in _PULSAR_VARIABLES_SET:
             filtered_variables.append(variable)
         else:
             raise ValueError(f"{variable} not a valid pulsar return variable")
@@ -154,7 +193,6 @@ class PermittedAlgorithms(str, Enum):
     md5 = "md5"
 
 
-@validate_arguments
 def obfuscate_text(
     text: str,
     algorithm: PermittedAlgorithms = PermittedAlgorithms.sha1.value,
@@ -193,7 +231,6 @@ def obfuscate_text(
     return algorithm(salted_text.encode()).hexdigest()
 
 
-@validate_arguments
 def obfuscate_tagged_users(
     text: str,
     algorithm: PermittedAlgorithms = PermittedAlgorithms.sha1.value,
@@ -224,9 +261,17 @@ def obfuscate_tagged_users(
         privacy concerns with tracking users across platforms.
     """
 
-    pattern = r"(?<![a-zA-Z0-9])(?:@|(?:u/))([a-zA-Z0-9_]+)"
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(
+            f'Algorithm "{algorithm}" not found in this installation of'
+            " hashlib - please use a different one."
+        )
+    ctor = hashlib.__dict__[algorithm]
+    salt_bytes = salt.encode() if salt is not None else b""
 
+    # ctor and salt_bytes are closed over as locals, so each match costs one
+    # encode and one hash with no intermediate call
     def repl(match: re.Match) -> str:
-        return f"@{obfuscate_text(match.group(), algorithm, salt)}"
+        return f"@{ctor(match.group().encode() + salt_bytes).hexdigest()}"
 
-    return re.sub(pattern, repl, text)
+    return _MENTION_RE.sub(repl, text)